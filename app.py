@@ -1,5 +1,6 @@
 from flask import Flask, request, jsonify, render_template, send_file, redirect, url_for, flash
 from flask_cors import CORS
+from flask_compress import Compress
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 import openai
 import pandas as pd
@@ -8,6 +9,12 @@ from dotenv import load_dotenv
 import json
 import io
 import base64
+import difflib
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -21,6 +28,19 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+# Compress JSON, HTML and static assets (brotli or gzip, negotiated via Accept-Encoding)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIMETYPES'] = ['application/json', 'application/javascript', 'text/javascript',
+                                   'text/css', 'text/html']
+# Static files are streamed responses; allow gzip for them too (not in the streaming default)
+app.config['COMPRESS_ALGORITHM_STREAMING'] = ['br', 'gzip']
+# Compressed responses carry an "<etag>:<encoding>" ETag, so re-check If-None-Match after compressing
+app.config['COMPRESS_EVALUATE_CONDITIONAL_REQUEST'] = True
+Compress(app)
+
+# Cache lifetime for fingerprinted static files (one year)
+STATIC_MAX_AGE = 31536000
+
 # Configure secret key for sessions
 app.secret_key = 'led-bom-secret-key-2024'
 
@@ -30,8 +50,186 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
 
+# Token budget for the LED data section of AI BOM prompts
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 1500))
+# Longer cell values are truncated so a single row cannot exhaust the budget
+PROMPT_MAX_CELL_CHARS = int(os.getenv('PROMPT_MAX_CELL_CHARS', 200))
+
+# OpenAI call limits
+OPENAI_DEADLINE = float(os.getenv('OPENAI_DEADLINE', 20))
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', 4))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+OPENAI_BREAKER_THRESHOLD = int(os.getenv('OPENAI_BREAKER_THRESHOLD', 5))
+OPENAI_BREAKER_RESET = float(os.getenv('OPENAI_BREAKER_RESET', 30))
+
+# Minimum name similarity (0-1) for the catalog fallback when OpenAI is unavailable
+FALLBACK_MATCH_CUTOFF = float(os.getenv('FALLBACK_MATCH_CUTOFF', 0.75))
+
+class OpenAIUnavailableError(Exception):
+    """Raised when OpenAI cannot answer within the deadline or the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Stop calling a failing service until a cool-down period has passed"""
+    def __init__(self, failure_threshold=OPENAI_BREAKER_THRESHOLD, reset_timeout=OPENAI_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+    
+    def is_open(self):
+        """Return True while requests are being rejected, without claiming the half-open trial"""
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            return self.trial_in_flight or time.monotonic() - self.opened_at < self.reset_timeout
+    
+    def allow_request(self):
+        """Return True if a request may be sent now"""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            # Half-open: let a single trial request through after the cool-down
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+class OpenAIClient:
+    """OpenAI chat client with per-call deadlines, a concurrency cap, jittered retries and a circuit breaker"""
+    RETRYABLE_ERRORS = (openai.APITimeoutError, openai.APIConnectionError,
+                        openai.RateLimitError, openai.InternalServerError)
+    
+    def __init__(self, api_key=None, base_url=None, deadline=OPENAI_DEADLINE,
+                 max_concurrency=OPENAI_MAX_CONCURRENCY, max_retries=OPENAI_MAX_RETRIES,
+                 breaker=None, backoff_base=0.5, backoff_cap=4.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        # Calls run on worker threads so the deadline can be enforced by wall-clock
+        # time; the SDK timeout only applies to each connect or read separately
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='openai')
+        self._client = None
+    
+    def _get_client(self):
+        """Create the underlying OpenAI client on first use (retries are handled here)"""
+        if self._client is None:
+            self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+    
+    def chat_completion(self, deadline=None, **kwargs):
+        """Create a chat completion, raising OpenAIUnavailableError if it cannot finish within the deadline"""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        
+        # Fail fast while the breaker is open instead of waiting for a slot
+        if self.breaker.is_open():
+            raise OpenAIUnavailableError('OpenAI circuit breaker is open')
+        
+        if not self.semaphore.acquire(timeout=max(0.0, deadline_at - time.monotonic())):
+            raise OpenAIUnavailableError('Timed out waiting for a free OpenAI request slot')
+        
+        try:
+            if not self.breaker.allow_request():
+                raise OpenAIUnavailableError('OpenAI circuit breaker is open')
+            
+            attempt = 0
+            while True:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    self.breaker.record_failure()
+                    raise OpenAIUnavailableError('OpenAI deadline exceeded')
+                
+                future = self.executor.submit(self._get_client().chat.completions.create,
+                                              timeout=remaining, **kwargs)
+                try:
+                    response = future.result(timeout=remaining)
+                except FuturesTimeoutError:
+                    # The worker thread finishes on its own; its result is discarded
+                    future.cancel()
+                    self.breaker.record_failure()
+                    raise OpenAIUnavailableError('OpenAI deadline exceeded')
+                except self.RETRYABLE_ERRORS as e:
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        self.breaker.record_failure()
+                        raise OpenAIUnavailableError(f'OpenAI request failed: {str(e)}')
+                    # Full-jitter exponential backoff, never sleeping past the deadline
+                    delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                    time.sleep(min(delay, max(0.0, deadline_at - time.monotonic())))
+                    continue
+                except openai.APIStatusError:
+                    # The API answered, so it is reachable; surface the error as before
+                    self.breaker.record_success()
+                    raise
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                
+                self.breaker.record_success()
+                return response
+        finally:
+            self.semaphore.release()
+
 # Initialize OpenAI client
-openai.api_key = os.getenv('OPENAI_API_KEY')
+openai_client = OpenAIClient(api_key=os.getenv('OPENAI_API_KEY'), base_url=os.getenv('OPENAI_BASE_URL'))
+
+# Fingerprint static URLs so browsers can cache them for a long time
+_static_fingerprints = {}
+
+def static_fingerprint(filename):
+    """Return a short content hash for a static file, recomputed when the file changes"""
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    
+    cached = _static_fingerprints.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    with open(path, 'rb') as f:
+        fingerprint = hashlib.md5(f.read(), usedforsecurity=False).hexdigest()[:12]
+    _static_fingerprints[filename] = (mtime, fingerprint)
+    return fingerprint
+
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        fingerprint = static_fingerprint(values['filename'])
+        if fingerprint:
+            values['v'] = fingerprint
+
+@app.after_request
+def add_static_cache_headers(response):
+    # Fingerprinted URLs change with the content, so they never need revalidation;
+    # any other version string keeps the default no-cache behaviour
+    if (request.endpoint == 'static' and response.status_code in (200, 304) and request.args.get('v') and
+            request.args['v'] == static_fingerprint(request.view_args.get('filename', ''))):
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    return response
 
 # User class for Flask-Login
 class User(UserMixin):
@@ -44,7 +242,7 @@ def load_user(user_id):
     return User(user_id)
 
 class LEDBOMGenerator:
-    def __init__(self):
+    def __init__(self, openai_client=None):
         self.led_components = {
             'led_chips': ['LED Chip', 'LED Driver IC', 'Thermal Pad'],
             'optics': ['Lens', 'Reflector', 'Diffuser', 'Optical Film'],
@@ -53,8 +251,11 @@ class LEDBOMGenerator:
             'mechanical': ['Housing', 'Mounting Bracket', 'Screw', 'Gasket'],
             'control': ['Microcontroller', 'Sensor', 'Switch', 'Potentiometer']
         }
+        # Catalog columns holding the parts of each model
+        self.component_columns = ['Heatsink', 'Trim', 'Lens / reflector', 'Lens holder or glass', 'LED bracket', 'LED']
         self.model_database = None
         self.bom_counter = 0  # Counter for BOM IDs
+        self.openai_client = openai_client or OpenAIClient()
         self.load_model_database()
     
     def load_model_database(self):
@@ -79,7 +280,9 @@ class LEDBOMGenerator:
             self.model_database = {
                 'by_model': df.set_index('Model').to_dict('index'),
                 'by_qr_code': df.set_index('QR code').to_dict('index'),
-                'dataframe': df
+                'dataframe': df,
+                # Hash of each model's full part set, aligned with the dataframe index
+                'part_hashes': pd.util.hash_pandas_object(df[self.component_columns], index=False)
             }
             
             print(f"Loaded {len(df)} models from Tangra database")
@@ -112,34 +315,41 @@ class LEDBOMGenerator:
         
         return None
     
-    def generate_bom_from_model(self, model_data, po_number=None):
+    def find_closest_model(self, query, cutoff=None):
+        """Find the catalog model whose name is closest to the query, returning (model_data, score)"""
+        if not self.model_database or not query:
+            return None, 0.0
+        
+        query = str(query).strip().upper()
+        cutoff = FALLBACK_MATCH_CUTOFF if cutoff is None else cutoff
+        matches = difflib.get_close_matches(query, list(self.model_database['by_model'].keys()), n=1, cutoff=cutoff)
+        if not matches:
+            return None, 0.0
+        
+        model_data = dict(self.model_database['by_model'][matches[0]])
+        model_data['Model'] = matches[0]
+        return model_data, round(difflib.SequenceMatcher(None, query, matches[0]).ratio(), 3)
+    
+    def generate_bom_from_model(self, model_data, po_number=None, bom_id=None):
         """Generate BOM from model data"""
         if not model_data:
             return None
         
-        # Increment BOM counter and generate unique BOM ID
-        self.bom_counter += 1
-        bom_id = f"BOM-{self.bom_counter:04d}"
+        if not bom_id:
+            # Increment BOM counter and generate unique BOM ID
+            self.bom_counter += 1
+            bom_id = f"BOM-{self.bom_counter:04d}"
         
         # Extract components from model data
         components = []
         
         # Use original Excel column names as categories
-        component_mapping = {
-            'Heatsink': 'Heatsink',
-            'Trim': 'Trim',
-            'Lens / reflector': 'Lens / reflector',
-            'Lens holder or glass': 'Lens holder or glass',
-            'LED bracket': 'LED bracket',
-            'LED': 'LED'
-        }
-        
-        for column, category in component_mapping.items():
+        for column in self.component_columns:
             if column in model_data and pd.notna(model_data[column]):
                 components.append({
                     'part_number': model_data[column],
                     'description': model_data[column],
-                    'category': category,
+                    'category': column,
                     'quantity': 1
                 })
         
@@ -157,6 +367,75 @@ class LEDBOMGenerator:
         
         return bom
     
+    def compare_models(self, models=None, filters=None, group_by=None):
+        """Diff the parts of a set of models and cluster them by shared part sets"""
+        if not self.model_database:
+            return None
+        
+        df = self.model_database['dataframe']
+        # De-duplicate group_by columns, keeping their order
+        group_by = list(dict.fromkeys(group_by or self.component_columns))
+        filters = filters or {}
+        
+        unknown = [c for c in group_by + list(filters) if c not in self.component_columns]
+        if unknown:
+            raise ValueError(f"Unknown component columns: {', '.join(unknown)}")
+        
+        # Select models by name and/or by exact part values
+        mask = pd.Series(True, index=df.index)
+        not_found = []
+        if models:
+            models = [str(m).strip() for m in models]
+            mask &= df['Model'].isin(models)
+            not_found = sorted(set(models) - set(df.loc[mask, 'Model']))
+        for column, value in filters.items():
+            mask &= df[column] == value
+        
+        selected = df[mask]
+        if selected.empty:
+            return {
+                'total_models': 0,
+                'not_found': not_found,
+                'common_parts': {},
+                'differing_columns': [],
+                'differences': [],
+                'group_by': group_by,
+                'clusters': []
+            }
+        
+        parts = selected[self.component_columns].astype(object)
+        parts = parts.where(parts.notna(), None)
+        
+        # Columns with a single value across the selection are common parts
+        distinct = selected[self.component_columns].nunique(dropna=False)
+        differing = [c for c in self.component_columns if distinct[c] > 1]
+        common = {c: parts[c].iloc[0] for c in self.component_columns if distinct[c] == 1}
+        
+        # Cluster models sharing the same parts in the group_by columns
+        if group_by == self.component_columns:
+            hashes = self.model_database['part_hashes'][mask]
+        else:
+            hashes = pd.util.hash_pandas_object(selected[group_by], index=False)
+        
+        # Both are in first-seen order, so clusters line up with their part sets
+        cluster_models = selected['Model'].groupby(hashes.values, sort=False).agg(list)
+        cluster_parts = parts.loc[hashes.drop_duplicates().index, group_by].to_dict('records')
+        clusters = [
+            {'parts': part_set, 'models': model_list, 'count': len(model_list)}
+            for part_set, model_list in zip(cluster_parts, cluster_models)
+        ]
+        clusters.sort(key=lambda cluster: cluster['count'], reverse=True)
+        
+        return {
+            'total_models': len(selected),
+            'not_found': not_found,
+            'common_parts': common,
+            'differing_columns': differing,
+            'differences': pd.concat([selected['Model'], parts[differing]], axis=1).to_dict('records'),
+            'group_by': group_by,
+            'clusters': clusters
+        }
+    
     def _group_components_by_category(self, components):
         """Group components by category"""
         categories = {}
@@ -366,6 +645,94 @@ class LEDBOMGenerator:
         except Exception as e:
             raise Exception(f"Error parsing XLSX: {str(e)}")
     
+    def _estimate_tokens(self, text):
+        """Estimate token count of text (roughly 4 characters per token)"""
+        return (len(text) + 3) // 4
+    
+    def _format_prompt_value(self, value):
+        """Render a cell value for the compact prompt table"""
+        if value is None or (isinstance(value, float) and pd.isna(value)):
+            return ''
+        text = ' '.join(str(value).replace('|', '/').split())
+        if len(text) > PROMPT_MAX_CELL_CHARS:
+            text = text[:PROMPT_MAX_CELL_CHARS - 3] + '...'
+        return text
+    
+    def compact_led_data(self, led_data, token_budget=None):
+        """Encode LED data as a de-duplicated pipe-delimited table within a token budget"""
+        token_budget = token_budget or PROMPT_TOKEN_BUDGET
+        if not led_data:
+            stats = dict.fromkeys(['original_tokens', 'compact_tokens', 'saved_tokens', 'prompt_tokens', 'truncated_tokens',
+                                   'rows', 'unique_rows', 'unique_rows_omitted', 'rows_omitted'], 0)
+            stats.update(savings_percent=0.0, token_budget=token_budget)
+            return '', stats
+        
+        original_tokens = self._estimate_tokens(json.dumps(led_data, indent=2, default=str))
+        
+        # Collect columns in first-seen order
+        columns = []
+        for row in led_data:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+        
+        rows = [[self._format_prompt_value(row.get(column)) for column in columns] for row in led_data]
+        
+        # Drop columns that are empty in every row
+        keep = [i for i in range(len(columns)) if any(row[i] for row in rows)]
+        columns = [columns[i] for i in keep]
+        
+        # De-duplicate identical rows, keeping first-seen order
+        counts = {}
+        for row in rows:
+            key = tuple(row[i] for i in keep)
+            counts[key] = counts.get(key, 0) + 1
+        
+        header = 'count|' + '|'.join(self._format_prompt_value(c) for c in columns)
+        all_lines = [header] + [f"{count}|" + '|'.join(values) for values, count in counts.items()]
+        lines = [header]
+        tokens = self._estimate_tokens(header)
+        rows_omitted = 0
+        unique_omitted = 0
+        for line, count in zip(all_lines[1:], counts.values()):
+            # Per-line estimates are only used for the budget check
+            line_tokens = self._estimate_tokens(line) + 1
+            # Skip rows that do not fit, but keep trying smaller ones
+            if tokens + line_tokens > token_budget:
+                unique_omitted += 1
+                rows_omitted += count
+                continue
+            lines.append(line)
+            tokens += line_tokens
+        
+        if counts and len(lines) == 1:
+            raise ValueError(f"No LED data rows fit within the prompt token budget ({token_budget} tokens)")
+        
+        # Compaction savings are measured on the full de-duplicated table; rows
+        # dropped to meet the budget are reported separately as truncation
+        compact_tokens = self._estimate_tokens('\n'.join(all_lines))
+        truncated_tokens = compact_tokens - self._estimate_tokens('\n'.join(lines))
+        
+        if unique_omitted:
+            lines.append(f"... {unique_omitted} more unique rows ({rows_omitted} rows) omitted to fit token budget")
+        
+        compact = '\n'.join(lines)
+        stats = {
+            'original_tokens': original_tokens,
+            'compact_tokens': compact_tokens,
+            'saved_tokens': original_tokens - compact_tokens,
+            'savings_percent': round(100.0 * (original_tokens - compact_tokens) / original_tokens, 1) if original_tokens else 0.0,
+            'prompt_tokens': self._estimate_tokens(compact),
+            'truncated_tokens': truncated_tokens,
+            'rows': len(led_data),
+            'unique_rows': len(counts),
+            'unique_rows_omitted': unique_omitted,
+            'rows_omitted': rows_omitted,
+            'token_budget': token_budget
+        }
+        
+        return compact, stats
+    
     def generate_bom_with_openai(self, led_data, user_input=""):
         """Generate BOM using OpenAI API"""
         try:
@@ -373,12 +740,18 @@ class LEDBOMGenerator:
             self.bom_counter += 1
             bom_id = f"BOM-{self.bom_counter:04d}"
             
+            # Compact the LED data to keep the prompt within the token budget
+            led_table, prompt_stats = self.compact_led_data(led_data)
+            print(f"{bom_id} prompt data: {prompt_stats['original_tokens']} -> {prompt_stats['compact_tokens']} tokens "
+                  f"({prompt_stats['saved_tokens']} saved, {prompt_stats['rows']} rows, {prompt_stats['unique_rows']} unique, "
+                  f"{prompt_stats['rows_omitted']} omitted for budget)")
+            
             # Prepare context for OpenAI
             context = f"""
             You are an expert LED lighting engineer creating a Bill of Materials (BOM) for LED light components.
             
-            LED Data provided:
-            {json.dumps(led_data, indent=2)}
+            LED Data provided (pipe-delimited table, header first; "count" is the number of identical rows):
+            {led_table}
             
             User requirements: {user_input}
             
@@ -413,15 +786,30 @@ class LEDBOMGenerator:
             }}
             """
             
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert LED lighting engineer specializing in Bill of Materials creation."},
-                    {"role": "user", "content": context}
-                ],
-                max_tokens=2000,
-                temperature=0.7
-            )
+            try:
+                response = self.openai_client.chat_completion(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": "You are an expert LED lighting engineer specializing in Bill of Materials creation."},
+                        {"role": "user", "content": context}
+                    ],
+                    max_tokens=2000,
+                    temperature=0.7
+                )
+            except OpenAIUnavailableError as e:
+                # Fall back to the closest catalog model so latency stays bounded
+                query = user_input or (' '.join(str(v) for v in led_data[0].values()) if led_data else '')
+                model_data, score = self.find_closest_model(query)
+                if not model_data:
+                    raise OpenAIUnavailableError(f"{str(e)}; no catalog model closely matches the request")
+                
+                print(f"{bom_id} OpenAI unavailable ({str(e)}), using closest catalog model {model_data.get('Model')} (score {score})")
+                bom = self.generate_bom_from_model(model_data, bom_id=bom_id)
+                bom['fallback'] = True
+                bom['fallback_reason'] = str(e)
+                bom['fallback_match_score'] = score
+                bom['prompt_stats'] = prompt_stats
+                return bom
             
             # Extract and parse the JSON response
             content = response.choices[0].message.content
@@ -433,6 +821,7 @@ class LEDBOMGenerator:
                 bom_data = json.loads(json_content)
                 # Ensure the BOM ID is set correctly
                 bom_data['bom_id'] = bom_id
+                bom_data['prompt_stats'] = prompt_stats
                 return bom_data
             else:
                 # Fallback: return a structured response
@@ -442,14 +831,27 @@ class LEDBOMGenerator:
                     "total_components": 0,
                     "estimated_cost": "$0.00",
                     "categories": [],
-                    "raw_response": content
+                    "raw_response": content,
+                    "prompt_stats": prompt_stats
                 }
                 
         except Exception as e:
             raise Exception(f"Error generating BOM with OpenAI: {str(e)}")
 
 # Initialize BOM generator
-bom_generator = LEDBOMGenerator()
+bom_generator = LEDBOMGenerator(openai_client)
+
+def describe_fallback(bom):
+    """Return the response message for a BOM built from the closest catalog model"""
+    return (f'AI unavailable, BOM generated from closest model: {bom.get("model_name", "Unknown")} '
+            f'(match score {bom.get("fallback_match_score")})')
+
+def describe_omitted_rows(bom):
+    """Return a message suffix when LED rows were left out of the AI prompt"""
+    stats = bom.get('prompt_stats') or {}
+    if not stats.get('rows_omitted'):
+        return ''
+    return f" ({stats['rows_omitted']} of {stats['rows']} rows omitted to fit the prompt token budget)"
 
 # Login routes
 @app.route('/login', methods=['GET', 'POST'])
@@ -511,10 +913,15 @@ def chat():
             # Generate BOM using AI
             bom = bom_generator.generate_bom_with_openai(led_data, user_input)
             
+            if bom.get('fallback'):
+                message = describe_fallback(bom)
+            else:
+                message = 'BOM generated using AI (model not found in database)' + describe_omitted_rows(bom)
+            
             return jsonify({
                 'success': True,
                 'bom': bom,
-                'message': 'BOM generated using AI (model not found in database)',
+                'message': message,
                 'model_found': False
             })
         
@@ -592,6 +999,48 @@ def get_models():
             'error': str(e)
         }), 400
 
+@app.route('/api/compare-models', methods=['POST'])
+@login_required
+def compare_models():
+    """Compare parts across models and cluster them by shared part sets"""
+    try:
+        data = request.get_json()
+        models = data.get('models', [])
+        filters = data.get('filters', {})
+        group_by = data.get('group_by', None)
+        
+        if not isinstance(models, list) or not isinstance(filters, dict) or \
+                (group_by is not None and not (isinstance(group_by, list) and all(isinstance(c, str) for c in group_by))):
+            return jsonify({
+                'success': False,
+                'error': '"models" and "group_by" must be lists of names and "filters" must be an object'
+            }), 400
+        
+        if not models and not filters:
+            return jsonify({
+                'success': False,
+                'error': 'Provide a list of models or part filters to compare'
+            }), 400
+        
+        comparison = bom_generator.compare_models(models, filters, group_by)
+        
+        if comparison is None:
+            return jsonify({
+                'success': False,
+                'error': 'Model database is not loaded'
+            }), 503
+        
+        return jsonify({
+            'success': True,
+            'comparison': comparison
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
 @app.route('/api/export-pdf', methods=['POST'])
 @login_required
 def export_pdf():
@@ -648,10 +1097,15 @@ def upload_csv():
         # Generate BOM
         bom = bom_generator.generate_bom_with_openai(led_data)
         
+        if bom.get('fallback'):
+            message = describe_fallback(bom)
+        else:
+            message = f'BOM generated successfully from CSV with {len(led_data)} LED entries' + describe_omitted_rows(bom)
+        
         return jsonify({
             'success': True,
             'bom': bom,
-            'message': f'BOM generated successfully from CSV with {len(led_data)} LED entries'
+            'message': message
         })
         
     except Exception as e:
@@ -677,10 +1131,15 @@ def upload_xlsx():
         # Generate BOM
         bom = bom_generator.generate_bom_with_openai(led_data)
         
+        if bom.get('fallback'):
+            message = describe_fallback(bom)
+        else:
+            message = f'BOM generated successfully from XLSX with {len(led_data)} LED entries' + describe_omitted_rows(bom)
+        
         return jsonify({
             'success': True,
             'bom': bom,
-            'message': f'BOM generated successfully from XLSX with {len(led_data)} LED entries'
+            'message': message
         })
         
     except Exception as e:
@@ -0,0 +1,89 @@
+"""Benchmark bytes-on-wire and latency for JSON and static responses.
+
+Compares uncompressed responses ("before") with gzip and brotli ("after")
+using the Flask test client, so no server needs to be running:
+
+    python bench_compression.py --iterations 50 --bandwidth-mbps 10
+
+Latency is measured server-side; the estimated total adds the time to
+transfer the response body at the given bandwidth.
+"""
+import argparse
+import re
+import statistics
+import time
+
+from app import app, bom_generator
+
+ENCODINGS = ['identity', 'gzip', 'br']
+
+
+def login(client):
+    with client.session_transaction() as session:
+        session['_user_id'] = 'admin'
+
+
+def build_requests(client):
+    """Return (label, method, url, json body) for each benchmarked endpoint"""
+    requests = [
+        ('GET /', 'get', '/', None),
+        ('GET /api/models?limit=50', 'get', '/api/models?limit=50', None),
+        ('GET /api/models?limit=1000', 'get', '/api/models?limit=1000', None),
+    ]
+
+    models = bom_generator.get_available_models(1)
+    if models:
+        requests.append(('POST /api/search-model', 'post', '/api/search-model',
+                         {'query': models[0]['Model'], 'po_number': 'PO-BENCH'}))
+
+    # Use the fingerprinted static URLs the page actually references
+    html = client.get('/').get_data(as_text=True)
+    for url in re.findall(r'"(/static/[^"]+)"', html):
+        requests.append((f"GET {url.split('?')[0]}", 'get', url, None))
+
+    return requests
+
+
+def measure(client, method, url, body, encoding, iterations):
+    headers = {'Accept-Encoding': encoding}
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = getattr(client, method)(url, json=body, headers=headers)
+        data = response.get_data()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'bytes': len(data),
+        'encoding': response.headers.get('Content-Encoding', 'identity'),
+        'cache_control': response.headers.get('Cache-Control', ''),
+        'median_ms': statistics.median(timings) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--bandwidth-mbps', type=float, default=10.0)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    login(client)
+    bytes_per_ms = args.bandwidth_mbps * 1000 * 1000 / 8 / 1000
+
+    print(f"{'endpoint':<32} {'encoding':<9} {'bytes':>9} {'saved':>7} {'server ms':>10} {'est. total ms':>14}")
+    for label, method, url, body in build_requests(client):
+        baseline = None
+        for encoding in ENCODINGS:
+            result = measure(client, method, url, body, encoding, args.iterations)
+            baseline = baseline or result['bytes']
+            saved = 100.0 * (baseline - result['bytes']) / baseline if baseline else 0.0
+            total_ms = result['median_ms'] + result['bytes'] / bytes_per_ms
+            print(f"{label:<32} {result['encoding']:<9} {result['bytes']:>9} {saved:>6.1f}% "
+                  f"{result['median_ms']:>10.2f} {total_ms:>14.2f}")
+        if result['cache_control']:
+            print(f"{'':<32} Cache-Control: {result['cache_control']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Check the OpenAI client's deadline, retry, circuit breaker and fallback paths.
+
+Starts local stub OpenAI servers (healthy, slow, slow-sending and failing) and runs AI BOM
+requests against them, so no API key or network access is needed:
+
+    python check_openai_client.py
+
+Exits with a non-zero status if any check fails.
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app import CircuitBreaker, OpenAIClient, OpenAIUnavailableError, bom_generator
+
+STUB_CONTENT = '{"project_name": "Stub BOM", "categories": []}'
+
+
+def make_handler(mode, calls):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            calls.append(time.monotonic())
+
+            if mode == 'slow':
+                time.sleep(5)
+            if mode == 'error':
+                self.send_json(500, {'error': {'message': 'stub failure'}})
+                return
+
+            # 'trickle' sends a valid completion in small chunks, so no single
+            # read times out even though the whole response takes several seconds
+            self.send_json(200, {
+                'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-3.5-turbo',
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': STUB_CONTENT}}],
+                'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+            }, chunk_delay=0.4 if mode == 'trickle' else None)
+
+        def send_json(self, status, body, chunk_delay=None):
+            data = json.dumps(body).encode()
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if chunk_delay is None:
+                    self.wfile.write(data)
+                    return
+                for i in range(0, len(data), 20):
+                    self.wfile.write(data[i:i + 20])
+                    self.wfile.flush()
+                    time.sleep(chunk_delay)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up at its deadline
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub(mode):
+    """Start a stub server in a background thread, returning (base_url, calls)"""
+    calls = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(mode, calls))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}/v1', calls
+
+
+def use_client(base_url, deadline=1.0, max_retries=2, failure_threshold=2, reset_timeout=60, max_concurrency=4):
+    bom_generator.openai_client = OpenAIClient(
+        api_key='stub', base_url=base_url, deadline=deadline, max_retries=max_retries,
+        breaker=CircuitBreaker(failure_threshold, reset_timeout), backoff_base=0.05,
+        max_concurrency=max_concurrency
+    )
+    return bom_generator.openai_client
+
+
+def timed_bom(query):
+    start = time.monotonic()
+    bom = bom_generator.generate_bom_with_openai([{'type': 'LED Light', 'description': query}], query)
+    return bom, time.monotonic() - start
+
+
+def main():
+    if not bom_generator.model_database:
+        print('Model database is not loaded; the fallback checks need the catalog Excel file')
+        return 1
+
+    model = bom_generator.get_available_models(1)[0]['Model']
+    # A model name with one character changed is missed by search_model (so /api/chat
+    # sends it to the AI path) but still passes the fallback cutoff; free text does not
+    near_model = model[:1] + ('X' if model[1] != 'X' else 'Y') + model[2:]
+    failures = []
+
+    def check(name, condition, detail=''):
+        print(f"{'PASS' if condition else 'FAIL'}  {name}{f' ({detail})' if detail else ''}")
+        if not condition:
+            failures.append(name)
+
+    check('misspelled model is not found by search_model', bom_generator.search_model(near_model) is None, near_model)
+
+    ok_url, ok_calls = start_stub('ok')
+    slow_url, slow_calls = start_stub('slow')
+    trickle_url, trickle_calls = start_stub('trickle')
+    error_url, error_calls = start_stub('error')
+
+    # Healthy server: the AI response is used
+    use_client(ok_url)
+    bom, elapsed = timed_bom(near_model)
+    check('healthy stub returns AI BOM', bom.get('project_name') == 'Stub BOM' and not bom.get('fallback'),
+          f'{elapsed:.2f}s')
+
+    # Slow server: the deadline bounds latency and the catalog fallback is used
+    client = use_client(slow_url, deadline=1.0)
+    bom, elapsed = timed_bom(near_model)
+    check('deadline falls back to closest model', bom.get('fallback') and bom.get('model_name') == model,
+          f"{bom.get('model_name')}, score {bom.get('fallback_match_score')}")
+    check('deadline bounds latency', elapsed < 1.5, f'{elapsed:.2f}s on a 1.0s deadline')
+
+    # A second timeout opens the breaker; the next call skips the API entirely
+    timed_bom(near_model)
+    calls_before = len(slow_calls)
+    bom, elapsed = timed_bom(near_model)
+    check('open breaker skips the API', bom.get('fallback') and len(slow_calls) == calls_before,
+          f"{bom.get('fallback_reason')}, {elapsed:.2f}s")
+    check('breaker is open', not client.breaker.allow_request())
+
+    # Slow-sending server: the deadline caps the whole call, not each read
+    client = use_client(trickle_url, deadline=1.0)
+    bom, elapsed = timed_bom(near_model)
+    check('deadline caps a slow-sending response', bom.get('fallback') and elapsed < 1.5,
+          f"{elapsed:.2f}s on a 1.0s deadline, {bom.get('fallback_reason')}")
+    check('slow-sending response counts as a failure', client.breaker.failures == 1)
+
+    # Failing server: retries, then fallback
+    use_client(error_url, max_retries=2)
+    bom, elapsed = timed_bom(near_model)
+    check('5xx is retried before falling back', bom.get('fallback') and len(error_calls) == 3,
+          f'{len(error_calls)} attempts, {elapsed:.2f}s')
+
+    # No similar model: the request fails instead of returning an unrelated BOM
+    use_client(error_url, max_retries=0)
+    try:
+        timed_bom('I need a 20W downlight with 3000K')
+        check('unmatched query raises', False, 'a BOM was returned')
+    except Exception as e:
+        check('unmatched query raises', 'no catalog model closely matches' in str(e), str(e))
+
+    # Direct client use raises OpenAIUnavailableError when the breaker is open
+    client = use_client(slow_url, deadline=0.3, failure_threshold=1)
+    try:
+        client.chat_completion(model='gpt-3.5-turbo', messages=[{'role': 'user', 'content': 'hi'}])
+    except OpenAIUnavailableError:
+        pass
+    try:
+        client.chat_completion(model='gpt-3.5-turbo', messages=[{'role': 'user', 'content': 'hi'}])
+        check('client raises when breaker is open', False)
+    except OpenAIUnavailableError as e:
+        check('client raises when breaker is open', 'circuit breaker' in str(e), str(e))
+
+    # An open breaker fails immediately, even when every request slot is busy
+    client = use_client(slow_url, deadline=2.0, failure_threshold=1, max_concurrency=1)
+    try:
+        client.chat_completion(deadline=0.3, model='gpt-3.5-turbo', messages=[{'role': 'user', 'content': 'hi'}])
+    except OpenAIUnavailableError:
+        pass
+    client.semaphore.acquire()
+    start = time.monotonic()
+    try:
+        client.chat_completion(model='gpt-3.5-turbo', messages=[{'role': 'user', 'content': 'hi'}])
+        check('open breaker fails without waiting for a slot', False)
+    except OpenAIUnavailableError as e:
+        elapsed = time.monotonic() - start
+        check('open breaker fails without waiting for a slot', 'circuit breaker' in str(e) and elapsed < 0.1,
+              f'{elapsed:.3f}s')
+    finally:
+        client.semaphore.release()
+
+    print(f"\n{len(failures)} check(s) failed" if failures else '\nAll checks passed')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())